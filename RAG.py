@@ -1,11 +1,20 @@
 import sqlite3
-from typing import List, Dict
+from typing import List, Dict, Optional
+
+def connect_readonly(db_path: str = 'funsearch.db') -> sqlite3.Connection:
+    """Open a read-only, memory-mapped connection for query-only RAG use"""
+    conn = sqlite3.connect(f"file:{db_path}?mode=ro", uri=True)
+    conn.execute("PRAGMA query_only=1")
+    conn.execute("PRAGMA mmap_size=268435456")
+    return conn
 
 class ExperimentRAG:
-    def __init__(self, db_path: str = 'funsearch.db'):
-        """Initialize the RAG system with database connection"""
-        self.conn = sqlite3.connect(db_path)
+    def __init__(self, db_path: str = 'funsearch.db', conn: Optional[sqlite3.Connection] = None):
+        """Initialize the RAG system with database connection (or reuse a pre-opened one)"""
+        self.conn = conn if conn is not None else sqlite3.connect(db_path)
         self.cursor = self.conn.cursor()
+        # (workload, top_n) -> cached get_top_policies_by_score result
+        self._top_by_score: Dict[tuple, List[Dict]] = {}
     
     def get_top_policies_by_cache_hit(self, workload: str, top_n: int = 2) -> List[Dict]:
         """
@@ -52,6 +61,65 @@ class ExperimentRAG:
         
         return policies
     
+    def get_top_policies_by_score(self, workload: str, top_n: int = 5) -> List[Dict]:
+        """
+        Retrieve top N policies for a given workload based on score.
+        Results are cached until note_score() reports a score that would enter the top N.
+        
+        Args:
+            workload: The workload to query
+            top_n: Number of top policies to return (default: 5)
+            
+        Returns:
+            List of dictionaries containing policy information with:
+            - policy name
+            - policy description
+            - workload description
+            - cpp file path
+            - cache hit rate
+            - score
+        """
+        key = (workload, top_n)
+        if key in self._top_by_score:
+            return self._top_by_score[key]
+
+        query = '''
+        SELECT 
+            policy, 
+            policy_description, 
+            workload_description, 
+            cpp_file_path,
+            cache_hit_rate,
+            score
+        FROM experiments
+        WHERE workload = ?
+        ORDER BY score DESC
+        LIMIT ?
+        '''
+        
+        self.cursor.execute(query, (workload, top_n))
+        policies = [
+            {
+                'policy': row[0],
+                'policy_description': row[1],
+                'workload_description': row[2],
+                'cpp_file_path': row[3],
+                'cache_hit_rate': row[4],
+                'score': row[5]
+            }
+            for row in self.cursor.fetchall()
+        ]
+
+        self._top_by_score[key] = policies
+        return policies
+
+    def note_score(self, workload: str, score: float):
+        """Drop cached top-N results for a workload that a newly recorded score would change"""
+        for key in [k for k in self._top_by_score if k[0] == workload]:
+            cached = self._top_by_score[key]
+            if len(cached) < key[1] or score > cached[-1]['score']:
+                del self._top_by_score[key]
+    
     def generate_response(self, workload: str) -> str:
         """
         Generate a natural language response with the top policies for a workload
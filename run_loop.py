@@ -1,5 +1,6 @@
 #!/usr/bin/env python3
 import sys, os
+import logging
 sys.path.append(os.path.abspath(".."))
 
 from dotenv import load_dotenv
@@ -13,6 +14,8 @@ from openai import OpenAI
 from RAG import ExperimentRAG
 from PromptGenerator import PolicyPromptGenerator
 
+log = logging.getLogger(__name__)
+
 
 # ──────────────────────────────────────────────────────────────────────────────
 # Configuration
@@ -39,10 +42,10 @@ workloads = [
 # ──────────────────────────────────────────────────────────────────────────────
 # Helpers
 # ──────────────────────────────────────────────────────────────────────────────
-def sanitize(name: str) -> str:
-    print("     3. 🔧 [Sanitize] Cleaning policy name")
+_SAN_RE = re.compile(r"[^A-Za-z0-9]+")
 
-    return "".join(c if c.isalnum() else "_" for c in name).strip("_").lower()
+def sanitize(name: str) -> str:
+    return _SAN_RE.sub("_", name).strip("_").lower()
 
 def parse_policy_content(text: str,) -> Tuple[Optional[str], Optional[str], Optional[str]]:
     def _extract(pattern: str):
@@ -57,7 +60,7 @@ def parse_policy_content(text: str,) -> Tuple[Optional[str], Optional[str], Opti
     return name, desc, code
 
 def compile_policy(cc: Path) -> Path:
-    print(f"     4. 🔨 [Compile] Compiling: {cc.name}\n")
+    log.debug("     4. 🔨 [Compile] Compiling: %s", cc.name)
 
     exe = cc.with_suffix(".out")
     subprocess.run(
@@ -77,7 +80,7 @@ def compile_policy(cc: Path) -> Path:
 
 def run_policy(exe: Path, trace_path: Path) -> str:
 
-    print(f"     5. ⏳ [Simulation] Starting simulation for: {exe.name} and {str(trace_path)}")
+    log.debug("     5. ⏳ [Simulation] Starting simulation for: %s and %s", exe.name, trace_path)
     start_time = time.time()
 
     res = subprocess.run(
@@ -93,13 +96,11 @@ def run_policy(exe: Path, trace_path: Path) -> str:
     )
 
     duration = time.time() - start_time
-    print(f"     6. 🏁 [Simulation] Finished in {duration:.2f} seconds for: {exe.name} and {trace_path}")
+    log.debug("     6. 🏁 [Simulation] Finished in %.2f seconds for: %s and %s", duration, exe.name, trace_path)
 
     return res.stdout
 
 def parse_hit_rate(output: str) -> float:
-    print("     7. 📊 [Metric] Parsing cache hit rate from output")
-
     m = re.search(r"LLC TOTAL\s+ACCESS:\s+(\d+)\s+HIT:\s+(\d+)", output)
     if not m:
         raise RuntimeError("LLC TOTAL not found")
@@ -126,6 +127,7 @@ def record(workload, name, desc, cc: Path, rate, workload_desc):
 def main():
     
     WORKLOAD = "all"
+    logging.basicConfig(level=logging.INFO, format="%(message)s")
 
     # 1) Setup RAG and PromptGenerator
     rag = ExperimentRAG(DB_PATH)
@@ -149,6 +151,7 @@ def main():
     prev_name = prev_desc = prev_code = None
     current_hit = best_hit
     i=0
+    CODE_TEMPLATE = prompt_gen._get_code_template()
     
     while True:
 
@@ -168,7 +171,7 @@ def main():
                 "## Policy Name\n<name>\n\n"
                 "## Policy Description\n<one paragraph describing the approach and why it helps>\n\n"
                 "## C++ Implementation\n"
-                f"{prompt_gen._get_code_template()}\n"
+                f"{CODE_TEMPLATE}\n"
             )
             
         else:
@@ -198,7 +201,7 @@ def main():
                 "## Policy Name\n<name>\n\n"
                 "## Policy Description\n<one paragraph explaining the approach and why it improves performance>\n\n"
                 "## C++ Implementation\n"
-                f"{prompt_gen._get_code_template()}\n"
+                f"{CODE_TEMPLATE}\n"
             )
 
         
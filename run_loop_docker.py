@@ -1,5 +1,10 @@
 #!/usr/bin/env python3
 import sys, os
+import asyncio
+import atexit
+import logging
+import hashlib
+import shutil
 sys.path.append(os.path.abspath(".."))
 
 from dotenv import load_dotenv
@@ -7,12 +12,15 @@ import re
 import time
 import sqlite3
 import subprocess
+from collections import deque
 from pathlib import Path
-from typing import Optional, Tuple
-from openai import OpenAI
-from RAG import ExperimentRAG
+from typing import Dict, Optional, Tuple
+from openai import AsyncOpenAI
+from RAG import ExperimentRAG, connect_readonly
 from PromptGenerator import PolicyPromptGenerator
 
+log = logging.getLogger(__name__)
+
 
 # ──────────────────────────────────────────────────────────────────────────────
 # Configuration
@@ -21,13 +29,20 @@ DB_PATH = "DB/funsearch.db"
 LIB_PATH = "ChampSim_CRC2/lib/config1.a"
 INCLUDE_DIR = "ChampSim_CRC2/inc"
 EXAMPLE_DIR = Path("ChampSim_CRC2/new_policies")
+BUILD_CACHE_DIR = EXAMPLE_DIR / "cache"
 
 WARMUP_INST = "1000000"
 SIM_INST = "10000000"
 MODEL = "o4-mini"
 ITERATIONS = 100
+LLM_CONCURRENCY = 1
+
+# RAM-backed mount inside the runner container that traces are staged into
+TRACE_STAGE_DIR = "/traces"
+TRACE_STAGE_SIZE = "4g"
 
 EXAMPLE_DIR.mkdir(parents=True, exist_ok=True)
+BUILD_CACHE_DIR.mkdir(parents=True, exist_ok=True)
 
 workloads = [
     {"name": "astar", "trace_path": "ChampSim_CRC2/traces/astar_313B.trace.gz"},
@@ -37,24 +52,85 @@ workloads = [
     {"name": "omnetpp", "trace_path": "ChampSim_CRC2/traces/omnetpp_17B.trace.gz"}
 ]
 
+# Matched against raw simulator stdout (bytes) to skip decoding multi-MB output
+_LLC_RE = re.compile(rb"LLC TOTAL\s+ACCESS:\s+(\d+)\s+HIT:\s+(\d+)")
+
 # ──────────────────────────────────────────────────────────────────────────────
 # Docker-based execution helpers
 # ──────────────────────────────────────────────────────────────────────────────
+_CONTAINER_ID: Optional[str] = None
+
+def start_container() -> str:
+    """Start one long-lived runner container and reuse it via `docker exec`"""
+    global _CONTAINER_ID
+    if _CONTAINER_ID is None:
+        _CONTAINER_ID = subprocess.check_output([
+            "docker", "run", "-d", "--platform", "linux/amd64", "--rm",
+            "-v", f"{os.getcwd()}:/app",
+            "-w", "/app",
+            "--tmpfs", f"{TRACE_STAGE_DIR}:size={TRACE_STAGE_SIZE}",
+            "champsim-runner",
+            "sleep", "infinity"
+        ]).decode().strip()
+        atexit.register(stop_container)
+    return _CONTAINER_ID
+
+def stop_container():
+    """Tear down the runner container started by start_container()"""
+    global _CONTAINER_ID
+    if _CONTAINER_ID is not None:
+        subprocess.run(["docker", "rm", "-f", _CONTAINER_ID], capture_output=True)
+        _CONTAINER_ID = None
+
+def stage_traces():
+    """Copy the traces into the container's tmpfs once and point workloads at the copies"""
+    run_in_docker(["cp", *(t["trace_path"] for t in workloads), TRACE_STAGE_DIR])
+    for t in workloads:
+        t["trace_path"] = f"{TRACE_STAGE_DIR}/{Path(t['trace_path']).name}"
+
 def run_in_docker(command: list, workdir: str = "/app") -> subprocess.CompletedProcess:
-    """Run a command inside a Docker container"""
+    """Run a command inside the persistent Docker container"""
     docker_cmd = [
-        "docker", "run", "--platform", "linux/amd64", "--rm",
-        "-v", f"{os.getcwd()}:/app",
+        "docker", "exec",
         "-w", workdir,
-        "champsim-runner",
+        start_container(),
         "bash", "-c",
         " ".join(command)
     ]
-    return subprocess.run(docker_cmd, check=True, capture_output=True, text=True)
+    return subprocess.run(docker_cmd, check=True, capture_output=True)
+
+def stream_in_docker(command: list, workdir: str = "/app") -> subprocess.Popen:
+    """Like run_in_docker, but hand back the process so stdout can be read line by line"""
+    docker_cmd = [
+        "docker", "exec",
+        "-w", workdir,
+        start_container(),
+        "bash", "-c",
+        " ".join(command)
+    ]
+    return subprocess.Popen(docker_cmd, stdout=subprocess.PIPE, stderr=subprocess.STDOUT)
+
+def _finish_stream(p: subprocess.Popen, cmd: list):
+    """Drain what is left of stdout without storing it, then check the exit code"""
+    for _ in p.stdout:
+        pass
+    if p.wait() != 0:
+        raise subprocess.CalledProcessError(p.returncode, cmd)
+
+def _log_summary(log_path: str) -> str:
+    """Shell snippet printing just the stats lines of a simulator log (tail if they are missing)"""
+    return f"{{ grep -E 'LLC TOTAL|IPC' {log_path} || tail -n 200 {log_path} ; }}"
+
+def _dump_tail(tail):
+    log.error(
+        "❌ [Debug] LLC TOTAL not found in output. Here's the tail of it:\n%s\n%s\n%s",
+        "=" * 50, b"".join(tail).decode(errors="replace"), "=" * 50,
+    )
+
+_SAN_RE = re.compile(r"[^A-Za-z0-9]+")
 
 def sanitize(name: str) -> str:
-    print("     3. 🔧 [Sanitize] Cleaning policy name")
-    return "".join(c if c.isalnum() else "_" for c in name).strip("_").lower()
+    return _SAN_RE.sub("_", name).strip("_").lower()
 
 def parse_policy_content(text: str,) -> Tuple[Optional[str], Optional[str], Optional[str]]:
     def _extract(pattern: str):
@@ -68,27 +144,63 @@ def parse_policy_content(text: str,) -> Tuple[Optional[str], Optional[str], Opti
     # print(f"📦 [Parse] Extracted policy: {name}")
     return name, desc, code
 
-def compile_policy(cc: Path) -> Path:
-    print(f"     4. 🔨 [Compile] Compiling: {cc.name} using Docker\n")
+COMPILE_FLAGS = ["-O3", "-flto", "-march=native", "-DNDEBUG", "-std=c++11", "-Wall"]
+
+# source hash -> cached binary, so repeats skip even the filesystem check
+_BUILT: Dict[str, Path] = {}
+
+# What -march=native resolves to inside the runner, filled on first compile
+_TARGET: Optional[bytes] = None
+
+def _native_target() -> bytes:
+    """The runner compiler's resolved target options; binaries are only valid for that CPU"""
+    global _TARGET
+    if _TARGET is None:
+        _TARGET = run_in_docker(["g++", "-march=native", "-Q", "--help=target"]).stdout
+    return _TARGET
+
+def _build_key(src: bytes) -> str:
+    """BLAKE2b of the policy source plus everything else that shapes the binary"""
+    h = hashlib.blake2b(src, digest_size=16)
+    h.update("\0".join(COMPILE_FLAGS + [LIB_PATH]).encode())
+    # The cache dir lives in the work tree, which may be shared across hosts
+    h.update(_native_target())
+    return h.hexdigest()
+
+def compile_policy(cc: Path, src: Optional[bytes] = None) -> Path:
+    log.debug("     4. 🔨 [Compile] Compiling: %s using Docker", cc.name)
 
     exe = cc.with_suffix(".out")
+
+    # Reuse a prior build when the generated source is byte-identical
+    key = _build_key(src if src is not None else cc.read_bytes())
+    cached = _BUILT.get(key)
+    if cached is None and (BUILD_CACHE_DIR / f"{key}.out").exists():
+        cached = _BUILT[key] = BUILD_CACHE_DIR / f"{key}.out"
+    if cached is not None:
+        log.debug("     4. ♻️  [Compile] Reusing cached build for: %s", cc.name)
+        shutil.copy(cached, exe)
+        return exe
     
     # Use Docker to compile
     compile_cmd = [
-        "g++", "-Wall", "--std=c++11",
+        "g++", *COMPILE_FLAGS,
         str(cc), LIB_PATH, "-o", str(exe)
     ]
     
     try:
         run_in_docker(compile_cmd)
-        return exe
     except subprocess.CalledProcessError as e:
-        print(f"Docker compilation failed: {e}")
+        log.error("Docker compilation failed: %s", e)
         raise
 
-def run_policy(exe: Path, trace_path: Path) -> str:
+    cached = _BUILT[key] = BUILD_CACHE_DIR / f"{key}.out"
+    shutil.copy(exe, cached)
+    return exe
+
+def run_policy(exe: Path, trace_path: Path) -> float:
     
-    print(f"     5. ⏳ [Simulation] Starting simulation for: {exe.name} and {str(trace_path)}")
+    log.debug("     5. ⏳ [Simulation] Starting simulation for: %s and %s", exe.name, trace_path)
     start_time = time.time()
 
     # Use Docker to run the simulation
@@ -99,58 +211,163 @@ def run_policy(exe: Path, trace_path: Path) -> str:
         "-traces", str(trace_path)
     ]
     
+    # Keep the full log inside the container; only the summary crosses the pipe
+    log_path = f"/tmp/{exe.stem}_{Path(trace_path).name}.log"
+    script = f"{' '.join(run_cmd)} > {log_path} 2>&1 ; rc=$? ; {_log_summary(log_path)} ; rm -f {log_path} ; exit $rc"
+
+    # Stream stdout and stop matching once the LLC summary line shows up
+    p = stream_in_docker([script])
+    rate = None
+    tail = deque(maxlen=20)
     try:
-        result = run_in_docker(run_cmd)
-        duration = time.time() - start_time
-        print(f"     6. 🏁 [Simulation] Finished in {duration:.2f} seconds for: {exe.name} and {trace_path}")
-        return result.stdout
+        for line in p.stdout:
+            m = _LLC_RE.search(line)
+            if m:
+                rate = parse_hit_rate(m)
+                break
+            tail.append(line)
+        _finish_stream(p, [script])
     except subprocess.CalledProcessError as e:
-        print(f"Docker simulation failed: {e}")
+        log.error("Docker simulation failed: %s", e)
         raise
 
-def parse_hit_rate(output: str) -> float:
-    print("     7. 📊 [Metric] Parsing cache hit rate from output")
-
-    # Try the standard format first
-    m = re.search(r"LLC TOTAL\s+ACCESS:\s+(\d+)\s+HIT:\s+(\d+)", output)
-    if m:
-        access_count = int(m.group(1))
-        hit_count = int(m.group(2))
-        if access_count > 0:
-            hit_rate = hit_count / access_count
-            print(f"     📊 [Metric] Found LLC stats: {hit_count}/{access_count} = {hit_rate:.4f}")
-            return hit_rate
-        else:
-            print("     ⚠️  [Warning] Zero LLC accesses found")
-            return 0.0
-    
-    # If not found, show debug info
-    print("❌ [Debug] LLC TOTAL not found in output. Here's the last 500 chars:")
-    print("=" * 50)
-    print(output[-500:])
-    print("=" * 50)
-    raise RuntimeError("LLC TOTAL not found")
+    if rate is None:
+        _dump_tail(tail)
+        raise RuntimeError("LLC TOTAL not found")
 
-def record(workload, name, desc, cc: Path, rate, workload_desc):
-    conn = sqlite3.connect(DB_PATH)
-    c = conn.cursor()
-    c.execute(
-        """
+    duration = time.time() - start_time
+    log.debug("     6. 🏁 [Simulation] Finished in %.2f seconds for: %s and %s", duration, exe.name, trace_path)
+    return rate
+
+TRACE_DELIM = b"===TRACE:"
+
+def run_all_traces(exe: Path) -> Dict[str, float]:
+    """Run every workload trace in a single docker exec; return hit rate per workload"""
+
+    log.debug("     5. ⏳ [Simulation] Starting batched simulation for: %s", exe.name)
+    start_time = time.time()
+
+    # Traces run concurrently inside the container, each into its own log,
+    # then only the summary lines of each log come back as delimited blocks.
+    logs = {t["name"]: f"/tmp/{exe.stem}_{t['name']}.log" for t in workloads}
+    launch = " ".join(
+        f"{exe} -warmup_instructions {WARMUP_INST} -simulation_instructions {SIM_INST} "
+        f"-traces {t['trace_path']} > {logs[t['name']]} 2>&1 &"
+        for t in workloads
+    )
+    collect = " ; ".join(
+        f'echo "{TRACE_DELIM.decode()}{name}===" ; {_log_summary(log_path)} ; rm -f {log_path}'
+        for name, log_path in logs.items()
+    )
+    script = f"{launch} wait ; {collect}"
+
+    p = stream_in_docker([script])
+    rates: Dict[str, float] = {}
+    current = None
+    tail = deque(maxlen=20)
+    try:
+        for line in p.stdout:
+            if line.startswith(TRACE_DELIM):
+                current = line[len(TRACE_DELIM):].split(b"===")[0].decode()
+                continue
+            if current is None or current in rates:
+                continue
+            m = _LLC_RE.search(line)
+            if m:
+                rates[current] = parse_hit_rate(m)
+                if len(rates) == len(logs):
+                    break
+            else:
+                tail.append(line)
+        _finish_stream(p, [script])
+    except subprocess.CalledProcessError as e:
+        log.error("Docker simulation failed: %s", e)
+        raise
+
+    missing = [name for name in logs if name not in rates]
+    if missing:
+        _dump_tail(tail)
+        raise RuntimeError(f"LLC TOTAL not found for: {', '.join(missing)}")
+
+    duration = time.time() - start_time
+    log.debug("     6. 🏁 [Simulation] Finished in %.2f seconds for: %s", duration, exe.name)
+    return rates
+
+def parse_hit_rate(m: "re.Match[bytes]") -> float:
+
+    access_count = int(m.group(1))
+    hit_count = int(m.group(2))
+    if access_count > 0:
+        hit_rate = hit_count / access_count
+        log.debug("     📊 [Metric] Found LLC stats: %d/%d = %.4f", hit_count, access_count, hit_rate)
+        return hit_rate
+    else:
+        log.warning("     ⚠️  [Warning] Zero LLC accesses found")
+        return 0.0
+
+async def call_llm(client: AsyncOpenAI, prompt: str, sem: asyncio.Semaphore) -> str:
+    """Send one prompt to the model and return its text output"""
+    async with sem:
+        resp = await client.responses.create(
+            model=MODEL,
+            reasoning={"effort": "high"},
+            input=prompt,
+        )
+    return resp.output_text
+
+_INSERT_SQL = """
       INSERT INTO experiments
         (workload, policy, policy_description, workload_description,
          cpp_file_path, cache_hit_rate, score)
-      VALUES (?, ?, ?, ?, ?, ?, ?)""",
-        (workload, name, desc, workload_desc, str(cc), rate, rate),
-    )
-    conn.commit()
-    conn.close()
+      VALUES (?, ?, ?, ?, ?, ?, ?)"""
+
+_pending_records = []
+_CONN: Optional[sqlite3.Connection] = None
+
+def get_conn() -> sqlite3.Connection:
+    """Open the experiments DB once (WAL, relaxed fsync) and reuse it for every write"""
+    global _CONN
+    if _CONN is None:
+        _CONN = sqlite3.connect(DB_PATH, check_same_thread=False, isolation_level=None)
+        _CONN.executescript(
+            "PRAGMA journal_mode=WAL;"
+            "PRAGMA synchronous=NORMAL;"
+            "PRAGMA temp_store=MEMORY;"
+            "PRAGMA cache_size=-20000;"
+        )
+    return _CONN
+
+def close_conn():
+    global _CONN
+    if _CONN is not None:
+        _CONN.close()
+        _CONN = None
+
+def record(workload, name, desc, cc: Path, rate, workload_desc):
+    """Buffer one experiment row; rows are written by flush_records()"""
+    _pending_records.append((workload, name, desc, workload_desc, str(cc), rate, rate))
+
+def flush_records():
+    """Write all buffered rows in a single transaction"""
+    if not _pending_records:
+        return
+    conn = get_conn()
+    conn.execute("BEGIN")
+    try:
+        conn.executemany(_INSERT_SQL, _pending_records)
+    except sqlite3.Error:
+        conn.execute("ROLLBACK")
+        raise
+    conn.execute("COMMIT")
+    _pending_records.clear()
 
 # ──────────────────────────────────────────────────────────────────────────────
 # Main Feedback Loop with Reward/Penalty
 # ──────────────────────────────────────────────────────────────────────────────
-def main():
+async def main():
     
     WORKLOAD = "all"
+    logging.basicConfig(level=logging.INFO, format="%(message)s")
 
     # Check if Docker is available
     try:
@@ -160,32 +377,44 @@ def main():
         print("❌ Docker is not available. Please install Docker to run this script.")
         return
 
+    cid = start_container()
+    print(f"✅ Started runner container {cid[:12]}")
+    stage_traces()
+
+    get_conn()
+
     # 1) Setup RAG and PromptGenerator
-    rag = ExperimentRAG(DB_PATH)
+    rag = ExperimentRAG(DB_PATH, conn=connect_readonly(DB_PATH))
     prompt_gen = PolicyPromptGenerator(DB_PATH)
     load_dotenv(dotenv_path=Path(".env"), override=False)
 
-    client = OpenAI(api_key=os.getenv("OPENAI_API_KEY"),)
+    client = AsyncOpenAI(api_key=os.getenv("OPENAI_API_KEY"),)
 
     top_policies = rag.get_top_policies_by_score(WORKLOAD, top_n=5)
     workload_desc, traces = rag.get_all_workloads_with_description_and_traces()
 
     best_hit = top_policies[0]["score"]
-    policy_summary = "\n".join(
-            f"Policy: {p['policy']}\nHit Rate: {float(p['score']):.2%}\nDescription:\n{p['policy_description']}\n"
-            for p in top_policies
-        )
 
     print(f"     📈 [Init] Starting best cache hit rate: {best_hit:.2%}")
 
     prev_name = prev_desc = prev_code = None
+    scored_name = None  # last design whose simulation has finished
     current_hit = best_hit
+    unreported = False  # scored_name's result has not been in a prompt yet
+    repeat_note = None  # set when the last response repeated a scored design
     i=0
-    
-    while True:
+    CODE_TEMPLATE = prompt_gen._get_code_template()
+
+    def next_prompt() -> str:
+        nonlocal best_hit, unreported, repeat_note
 
-        if i == 0:
-            prompt = (
+        if prev_name is None:
+            # Served from the RAG cache unless a recorded run has entered the top 5
+            policy_summary = "\n".join(
+                    f"Policy: {p['policy']}\nHit Rate: {float(p['score']):.2%}\nDescription:\n{p['policy_description']}\n"
+                    for p in rag.get_top_policies_by_score("all", top_n=5)
+                )
+            return (
                 f"The following workloads are under consideration:\n"
                 f"{workload_desc}\n\n"
                 "The top-performing cache replacement policies from past experiments are:\n"
@@ -200,49 +429,68 @@ def main():
                 "## Policy Name\n<name>\n\n"
                 "## Policy Description\n<one paragraph describing the approach and why it helps>\n\n"
                 "## C++ Implementation\n"
-                f"{prompt_gen._get_code_template()}\n"
+                f"{CODE_TEMPLATE}\n"
             )
-            
-        else:
-            if current_hit > best_hit:
-                feedback = (
-                    f"Great! Policy improved from {best_hit:.2%} to "
-                    f"{current_hit:.2%}. Please refine further."
-                )
-                best_hit = current_hit
-            else:
-                feedback = (
-                    f"Policy hit rate was {current_hit:.2%}, not better than "
-                    f"{best_hit:.2%}. Try a different approach."
-                )
 
-            prompt = (
-                f"The following workloads are under consideration:\n"
-                f"{workload_desc}\n\n"
-                f"Your previous design was **{prev_name}**:\n\n"
-                f"Description:\n{prev_desc}\n\n"
-                f"Implementation:\n```cpp\n{prev_code}\n```\n\n"
-                f"Feedback from the last run:\n{feedback}\n\n"
-                "Task: Refine or redesign the policy to achieve better performance across all workloads. "
-                "Consider workload characteristics such as branching behavior, memory access patterns, spatial and temporal locality, and phase changes. "
-                "You may propose modifications, hybrid approaches, or completely new ideas if needed.\n\n"
-                "Produce the output in the exact format below:\n\n"
-                "## Policy Name\n<name>\n\n"
-                "## Policy Description\n<one paragraph explaining the approach and why it improves performance>\n\n"
-                "## C++ Implementation\n"
-                f"{prompt_gen._get_code_template()}\n"
+        if scored_name is None:
+            feedback = f"{prev_name} is still being simulated; no results yet."
+        elif not unreported:
+            feedback = (
+                f"No new results since {scored_name} ({current_hit:.2%}); "
+                f"the best so far is {best_hit:.2%}."
+            )
+        elif current_hit > best_hit:
+            feedback = (
+                f"Great! {scored_name} improved from {best_hit:.2%} to "
+                f"{current_hit:.2%}. Please refine further."
+            )
+            best_hit = current_hit
+        else:
+            feedback = (
+                f"{scored_name} hit rate was {current_hit:.2%}, not better than "
+                f"{best_hit:.2%}. Try a different approach."
             )
+        if scored_name is not None:
+            unreported = False
+        if repeat_note:
+            feedback += f"\n{repeat_note}"
+            repeat_note = None
+
+        return (
+            f"The following workloads are under consideration:\n"
+            f"{workload_desc}\n\n"
+            f"Your previous design was **{prev_name}**:\n\n"
+            f"Description:\n{prev_desc}\n\n"
+            f"Implementation:\n```cpp\n{prev_code}\n```\n\n"
+            f"Feedback from the last completed run:\n{feedback}\n\n"
+            "Task: Refine or redesign the policy to achieve better performance across all workloads. "
+            "Consider workload characteristics such as branching behavior, memory access patterns, spatial and temporal locality, and phase changes. "
+            "You may propose modifications, hybrid approaches, or completely new ideas if needed.\n\n"
+            "Produce the output in the exact format below:\n\n"
+            "## Policy Name\n<name>\n\n"
+            "## Policy Description\n<one paragraph explaining the approach and why it improves performance>\n\n"
+            "## C++ Implementation\n"
+            f"{CODE_TEMPLATE}\n"
+        )
+
+    # Design i is simulated in a worker thread while the model drafts design
+    # i+1 on the event loop, so the LLM round-trip hides behind simulation time.
+    loop = asyncio.get_running_loop()
+    llm_sem = asyncio.Semaphore(LLM_CONCURRENCY)
+    llm_task = None
+
+    # sha256(code) -> average hit rate, so repeated designs are not re-simulated
+    seen: Dict[str, float] = {}
+    
+    while True:
 
-        
         # 5) Call model
-        resp = client.responses.create(
-            model=MODEL,
-            reasoning={"effort": "high"},
-            input=prompt,
-        )
-        print(f"     1. 📤 [LLM] Iteration {i}: Sending prompt to model")
+        if llm_task is None:
+            print(f"     1. 📤 [LLM] Iteration {i}: Sending prompt to model")
+            llm_task = asyncio.create_task(call_llm(client, next_prompt(), llm_sem))
 
-        text = resp.output_text
+        text = await llm_task
+        llm_task = None
         print("     2. 📥 [LLM] Response received from OpenAI")
 
         # 6) Parse LLM output
@@ -250,46 +498,71 @@ def main():
         if not (name and desc and code):
             raise RuntimeError(f"❌ Parse failed")
 
+        code_bytes = code.encode("utf-8")
+        code_hash = hashlib.sha256(code_bytes).hexdigest()
+        if code_hash in seen:
+            # Keep the pending result of the last simulated design: the prompt
+            # in flight was built before it finished, so it still has to be reported
+            repeat_note = (
+                f"Your latest response, {name}, repeated an earlier design that already "
+                f"scored {seen[code_hash]:.2%}; it was skipped. Propose something new."
+            )
+            print(f"♻️  [Dedup] Iteration {i}: {name} matches an earlier design → average hit rate {seen[code_hash]:.2%}\n")
+            i+=1
+            continue
+
         # 7) Write, compile, run
         base = sanitize(name)
         cc = EXAMPLE_DIR / f"{i:03}_{base}.cc"
-        cc.write_text(code, encoding="utf-8")
+        cc.write_bytes(code_bytes)
        
         try:
-            exe = compile_policy(cc)
+            exe = compile_policy(cc, code_bytes)
         except subprocess.CalledProcessError as e:
             print(f"❌ [Compile Error]:\n{e}")
             continue  # ← this restarts the loop at the top
 
+        sim_future = loop.run_in_executor(None, run_all_traces, exe)
+
+        # 9) Prepare the next iteration while this one simulates
+        prev_name, prev_desc, prev_code = name, desc, code
+        print(f"     1. 📤 [LLM] Iteration {i + 1}: Sending prompt to model")
+        llm_task = asyncio.create_task(call_llm(client, next_prompt(), llm_sem))
+
         current_hit_tmp=0
-        
+
+        rates = await sim_future
         for trace_info in workloads:
             WORKLOAD = trace_info["name"]
-            trace_path = trace_info["trace_path"]
 
-            out = run_policy(exe, trace_path)
-            tmp = parse_hit_rate(out)
+            tmp = rates[WORKLOAD]
             current_hit_tmp += tmp
             record(WORKLOAD, name, desc, cc, tmp, "")
             print(f"      [+] {name} → workload: {WORKLOAD} → hit rate: {tmp}\n")
 
         current_hit = current_hit_tmp / len(workloads)
+        scored_name = name
+        unreported = True
+        seen[code_hash] = current_hit
         print(f"✅ [Result] Iteration {i}: {name}  → average hit rate {current_hit:.2%}\n")
 
         # 8) Record experiment
         record("all",name, desc, cc, current_hit, "")
+        flush_records()
+        rag.note_score("all", current_hit)
 
         i+=1
 
         if current_hit/best_hit > 1.3:
             break
 
-        # 9) Prepare for next iteration
-        prev_name, prev_desc, prev_code = name, desc, code
-
+    if llm_task is not None:
+        llm_task.cancel()
+    await client.close()
     prompt_gen.close()
     rag.close()
+    close_conn()
 
 
 if __name__ == "__main__":
-    main()
\ No newline at end of file
+    asyncio.run(main())
\ No newline at end of file
@@ -1,39 +1,109 @@
 #!/usr/bin/env python3
-import sqlite3, re, os, sys
+import sqlite3, os, sys
+from contextlib import closing
 from pathlib import Path
+import numpy as np
 import pandas as pd
+import connectorx as cx
+import pyarrow as pa
+import pyarrow.csv as pacsv
+import matplotlib
+matplotlib.use("Agg")  # file output only; skip GUI backend setup
 import matplotlib.pyplot as plt
 
 DB = Path("DB/funsearch.db")
+DB_CACHE = Path("DB/funsearch.parquet")
 OUT_DIR = Path("results")
 PLOT_DIR = Path("plots")
+PLOT_DPI = int(os.environ.get("PLOT_DPI", "100"))
 OUT_DIR.mkdir(exist_ok=True, parents=True)
 PLOT_DIR.mkdir(exist_ok=True, parents=True)
 
-def read_db():
-    con = sqlite3.connect(DB)
-    df = pd.read_sql_query("SELECT workload, policy, policy_description, cpp_file_path, cache_hit_rate, score FROM experiments", con)
-    con.close()
-    # Keep only known workloads
-    keep = {"astar","lbm","mcf","milc","omnetpp","all"}
-    df = df[df["workload"].isin(keep)].copy()
+# Known workloads; anything else in the DB is ignored
+KEEP_WORKLOADS = ("astar","lbm","mcf","milc","omnetpp","all")
+
+def _write_csv(df, path, index=False):
+    # Arrow's C++ CSV writer instead of pandas' Python-level one
+    if index:
+        df = df.reset_index()
+    pacsv.write_csv(pa.Table.from_pandas(df, preserve_index=False), str(path))
+
+def ensure_indexes(con):
+    """Index the columns read_db filters and aggregates on (idempotent)"""
+    # WAL is persisted in the DB file, so it also applies to connectorx's reads
+    con.execute("PRAGMA journal_mode=WAL")
+    con.execute("CREATE INDEX IF NOT EXISTS ix_exp_workload_policy_hr ON experiments(workload, policy, cache_hit_rate)")
+    con.commit()
+
+def query_experiments(columns, order_by=None):
+    # connectorx decodes rows in Rust straight into column buffers; it takes no
+    # bind parameters, so the (constant) workload list is inlined into the SQL
+    keep = ",".join(f"'{w}'" for w in KEEP_WORKLOADS)
+    return cx.read_sql(
+        f"sqlite://{DB.resolve().as_posix()}",
+        f"SELECT {', '.join(columns)} FROM experiments WHERE workload IN ({keep})"
+        + (f" ORDER BY {order_by}" if order_by else ""),
+        return_type="pandas",
+    )
+
+def read_db(con):
+    ensure_indexes(con)
+    # One read serves both the raw dump and the analysis; ordered by id so the
+    # dump keeps insertion order (the workload index would otherwise change it)
+    df = query_experiments(["workload", "policy", "policy_description", "cpp_file_path", "cache_hit_rate", "score"], order_by="id")
+    # Low-cardinality keys: group on integer codes instead of Python strings
+    df["workload"] = df["workload"].astype("category")
+    df["policy"] = df["policy"].astype("category")
     return df
 
-def infer_iter(cpp_path:str)->int:
-    # filenames like: 003_triship.cc  →  3
-    m = re.match(r".*?([0-9]{3})_", Path(cpp_path).name)
-    return int(m.group(1)) if m else -1
+def analysis_frame(df):
+    """Drop what the aggregations don't read and narrow the numeric columns"""
+    df = df.drop(columns="policy_description")
+    # Hit rates and scores are bounded fractions; float32 is plenty
+    for c in ("cache_hit_rate","score"):
+        df[c] = pd.to_numeric(df[c], downcast="float")
+    return df
 
-def export_all(df):
-    df.to_csv(OUT_DIR/"all_runs.csv", index=False)
+def db_mtime():
+    # In WAL mode new rows land in the -wal file before the main DB file changes
+    wal = DB.with_name(DB.name + "-wal")
+    return max(p.stat().st_mtime for p in (DB, wal) if p.exists())
+
+def _up_to_date(*outputs):
+    """True when every output file exists and is at least as new as the DB"""
+    src = db_mtime()
+    return all(p.exists() and p.stat().st_mtime >= src for p in outputs)
+
+def load_cached(con):
+    """read_db(), served from a parquet snapshot while the DB is unchanged"""
+    if DB_CACHE.exists() and DB_CACHE.stat().st_mtime >= db_mtime():
+        return pd.read_parquet(DB_CACHE, engine="pyarrow")
+    df = read_db(con)
+    df.to_parquet(DB_CACHE, engine="pyarrow", compression="zstd", index=False)
+    return df
 
-def pivot_by_policy(df):
-    # average across workloads (exclude 'all' rows when computing mean)
-    df_wo_all = df[df.workload != "all"].copy()
-    piv = df_wo_all.pivot_table(index="policy", columns="workload", values="cache_hit_rate", aggfunc="max")
+def infer_iter(cpp_paths: pd.Series) -> pd.Series:
+    # filenames like: 003_triship.cc  →  3  (-1 when there is no NNN_ prefix)
+    names = cpp_paths.str.rsplit("/", n=1).str[-1]
+    digits = names.str.extract(r"^.*?([0-9]{3})_", expand=False)
+    return pd.to_numeric(digits, errors="coerce").fillna(-1).astype("int32")
+
+def export_all(df):
+    # Full-precision dump, written before analysis_frame() narrows the frame
+    out = OUT_DIR/"all_runs.csv"
+    if _up_to_date(out): return
+    _write_csv(df, out)
+
+def pivot_by_policy(df_wo_all):
+    # average across workloads; expects the 'all' rows already filtered out
+    # observed=True below only bounds the grid if the keys are categorical
+    assert df_wo_all["policy"].dtype.name == "category"
+    piv = (df_wo_all.groupby(["policy","workload"], observed=True)["cache_hit_rate"]
+           .max()
+           .unstack("workload"))
     piv["average"] = piv.mean(axis=1)
     piv.sort_values("average", ascending=False, inplace=True)
-    piv.to_csv(OUT_DIR/"pivot_by_policy.csv")
+    _write_csv(piv, OUT_DIR/"pivot_by_policy.csv", index=True)
     return piv
 
 def top_policy_name(piv):
@@ -41,37 +111,39 @@ def top_policy_name(piv):
     return piv.index[0]
 
 def plot_top_policy_bars(piv, title="Top policy vs. workloads (LLC hit rate)"):
-    if len(piv)==0: return
+    out = PLOT_DIR/"top_policy_per_workload.png"
+    if len(piv)==0 or _up_to_date(out): return
     top = piv.iloc[0:1].drop(columns=["average"])
-    fig = plt.figure()
-    top.T.plot(kind="bar", legend=False)
-    plt.ylabel("LLC hit rate")
-    plt.ylim(0, 1.0)
-    plt.title(f"{title}\n{top.index[0]}")
-    plt.tight_layout()
-    plt.savefig(PLOT_DIR/"top_policy_per_workload.png", dpi=200)
-    plt.close()
-
-def best_so_far_vs_iter(df):
+    fig, ax = plt.subplots()
+    top.T.plot(kind="bar", ax=ax, legend=False)
+    ax.set_ylabel("LLC hit rate")
+    ax.set_ylim(0, 1.0)
+    ax.set_title(f"{title}\n{top.index[0]}")
+    fig.savefig(out, dpi=PLOT_DPI, bbox_inches="tight")
+    plt.close(fig)
+
+def best_so_far_vs_iter(df_wo_all):
+    out, csv = PLOT_DIR/"best_so_far_vs_iteration.png", OUT_DIR/"best_per_iter.csv"
+    if _up_to_date(out, csv): return
     # Use per-(policy,workload) rows; infer iteration from filename
-    df = df.copy()
-    df["iter"] = df["cpp_file_path"].apply(infer_iter)
-    df = df[(df.iter >= 0) & (df.workload != "all")]
+    df = df_wo_all.assign(iter=infer_iter(df_wo_all["cpp_file_path"]))
+    df = df[df.iter >= 0]
     # For each iteration, compute the mean hit rate of that policy across workloads
-    grouped = df.groupby(["iter","policy"])["cache_hit_rate"].mean().reset_index()
-    best_per_iter = grouped.sort_values(["iter","cache_hit_rate"], ascending=[True,False]).drop_duplicates(["iter"])
-    best_per_iter.to_csv(OUT_DIR/"best_per_iter.csv", index=False)
-
-    fig = plt.figure()
-    plt.plot(best_per_iter["iter"], best_per_iter["cache_hit_rate"], marker="o")
-    plt.xlabel("Iteration")
-    plt.ylabel("Best mean LLC hit rate at iteration")
-    plt.ylim(0, 1.0)
-    plt.title("Best-so-far mean hit rate vs. iteration")
-    plt.grid(True, linestyle="--", alpha=0.4)
-    plt.tight_layout()
-    plt.savefig(PLOT_DIR/"best_so_far_vs_iteration.png", dpi=200)
-    plt.close()
+    grouped = df.groupby(["iter","policy"], observed=True)["cache_hit_rate"].mean().reset_index()
+    # One grouped argmax pass instead of a full sort + dedup
+    idx = grouped.groupby("iter")["cache_hit_rate"].idxmax()
+    best_per_iter = grouped.loc[idx].sort_values("iter")
+    _write_csv(best_per_iter, csv)
+
+    fig, ax = plt.subplots()
+    ax.plot(best_per_iter["iter"], best_per_iter["cache_hit_rate"], marker="o")
+    ax.set_xlabel("Iteration")
+    ax.set_ylabel("Best mean LLC hit rate at iteration")
+    ax.set_ylim(0, 1.0)
+    ax.set_title("Best-so-far mean hit rate vs. iteration")
+    ax.grid(True, linestyle="--", alpha=0.4)
+    fig.savefig(out, dpi=PLOT_DPI, bbox_inches="tight")
+    plt.close(fig)
 
 def quick_ablations(df):
     # Iteration effect: already produced as best_so_far_vs_iter()
@@ -84,7 +156,6 @@ def area_table_example():
     matching HW1 guidance (2MiB, 16-way, 64B lines ⇒ 32,768 lines; 2,048 sets). 
     Edit bits below for your *actual* best policy.
     """
-    import math
     num_lines = 32768
     num_sets  = 2048
 
@@ -104,37 +175,44 @@ def area_table_example():
         "SHCT": 2 * 2048
     }
 
-    per_line_total = sum(per_line_bits.values())
-    per_set_total  = sum(per_set_bits.values())
-    global_total   = sum(global_bits.values())
-
-    extra_bits = per_line_total*num_lines + per_set_total*num_sets + global_total
-    extra_bytes = extra_bits/8.0
-    kib = extra_bytes/1024.0
+    # One entry per field; reps = how many copies of it the LLC holds
+    groups = [("per-line", per_line_bits, num_lines), ("per-set", per_set_bits, num_sets), ("global", global_bits, 1)]
+    scopes = [scope for scope, d, _ in groups for _ in d]
+    fields = [k for _, d, _ in groups for k in d]
+    bits = np.fromiter((v for _, d, _ in groups for v in d.values()), dtype=np.int64)
+    reps = np.fromiter((n for _, d, n in groups for _ in d), dtype=np.int64)
 
-    rows = []
-    for k,v in per_line_bits.items(): rows.append(("per-line", k, v, f"{v*num_lines/8/1024:.2f} KiB"))
-    for k,v in per_set_bits.items():  rows.append(("per-set", k, v, f"{v*num_sets/8/1024:.2f} KiB"))
-    for k,v in global_bits.items():   rows.append(("global",  k, v, f"{v/8/1024:.2f} KiB"))
-    rows.append(("TOTAL", "", extra_bits, f"{kib:.2f} KiB"))
+    extra_bits = int(bits @ reps)
+    kib = extra_bits/8.0/1024.0
 
-    df = pd.DataFrame(rows, columns=["scope","field","bits","approx_size"])
-    df.to_csv(OUT_DIR/"area_table_example.csv", index=False)
+    df = pd.DataFrame({
+        "scope": scopes + ["TOTAL"],
+        "field": fields + [""],
+        "bits": np.append(bits, extra_bits),
+        "approx_size": np.char.mod("%.2f KiB", np.append(bits*reps/8/1024, kib)),
+    })
+    _write_csv(df, OUT_DIR/"area_table_example.csv")
 
 def main():
     if not DB.exists():
         print(f"DB not found: {DB}")
         sys.exit(1)
 
-    df = read_db()
+    # One SQLite connection for the whole run (connectorx reads use their own)
+    with closing(sqlite3.connect(DB)) as con:
+        df = load_cached(con)
     export_all(df)
-    piv = pivot_by_policy(df)
+    df = analysis_frame(df)
+    # Both aggregations work on per-workload rows; filter them once
+    df_wo_all = df[df.workload != "all"]
+    piv = pivot_by_policy(df_wo_all)
     plot_top_policy_bars(piv)
-    best_so_far_vs_iter(df)
+    best_so_far_vs_iter(df_wo_all)
     area_table_example()
 
-    # Also dump top-5 policies by average
-    (piv.head(5)).to_csv(OUT_DIR/"top5_policies.csv")
+    # Also dump top-5 policies by average; piv is already ranked (and keyed
+    # by a CategoricalIndex), so this is a slice, not another sort
+    _write_csv(piv.head(5), OUT_DIR/"top5_policies.csv", index=True)
 
     # Print quick summary
     top = piv.index[0] if len(piv)>0 else "N/A"